@@ -0,0 +1,126 @@
+import functools
+import hashlib
+import json
+import os
+import random
+
+from history import register_articles
+
+# --- BRIQUES PARTAGÉES ---
+# Ce dont le menu (main.py) et les jobs (feeds, neighbours, scoring,
+# evaluation) ont tous besoin. Ce module n'importe rien de main.py : lancer
+# `python main.py` ne charge main.py qu'une fois, et le scheduler de feeds
+# partage les mêmes caches que le menu.
+
+
+# --- 1. CHARGEMENT DES DONNÉES ---
+class Catalog(list):
+    # La liste des articles, avec la version du fichier lu (date de modif,
+    # taille) : scoring.py sait sans tout comparer si le catalogue a changé
+    version = None
+
+
+def load_data():
+    with open("users.json", "r") as f:
+        users = json.load(f)
+    with open("articles.json", "r") as f:
+        st = os.fstat(f.fileno())
+        articles = Catalog(json.load(f))
+    articles.version = (st.st_mtime_ns, st.st_size)
+    # Index des articles dans l'ordre du catalogue (cf. history.py)
+    register_articles(articles)
+    return users, articles
+
+
+# --- 2. ALÉATOIRE REPRODUCTIBLE ---
+# Sans seed, on garde le comportement historique (module random global).
+# Avec une seed, chaque requête a sa clé dérivée de (user_id, epoch, seed) :
+# même entrée -> même liste, quel que soit le backend.
+JITTER_MAX = 0.2
+MASK64 = (1 << 64) - 1
+
+
+def hash64(text):
+    return int.from_bytes(
+        hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def request_key(user_id, epoch=0, seed=None):
+    return hash64(f"{user_id}:{epoch}:{seed}")
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def article_key(article_id):
+    return hash64(article_id)
+
+
+def mix64(x):
+    # Mélange "splitmix64" : un compteur -> 64 bits pseudo-aléatoires.
+    # Uniquement des +, *, ^ et >> sur 64 bits : scoring.py refait exactement
+    # le même calcul en NumPy (uint64) sur tout le catalogue d'un coup.
+    z = (x + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def request_rng(user_id, epoch=0, seed=None):
+    if seed is None:
+        return random
+    return random.Random(f"{user_id}:{epoch}:{seed}")
+
+
+def article_jitter(user_id, article_id, epoch=0, seed=None, amplitude=JITTER_MAX):
+    # Hash de (clé de la requête, clé de l'article) : le jitter ne dépend pas
+    # de l'ordre dans lequel on score les articles (boucle, vectorisé ou
+    # multi-process), et il n'y a pas de générateur à créer par article
+    if seed is None:
+        return random.uniform(0, amplitude)
+    h = mix64(request_key(user_id, epoch, seed) ^ article_key(article_id))
+    # 53 bits de poids fort -> float dans [0, 1)
+    return (h >> 11) * 2.0**-53 * amplitude
+
+
+# --- 3. RECOMMANDATION ---
+def silent(*args, **kwargs):
+    pass
+
+
+# Part de la liste pour chaque source (la découverte prend le reste)
+DEFAULT_SLOTS = {"pertinence": 0.7, "collab": 0.15}
+
+# Journal des interactions (sert au rejeu hors-ligne, cf. evaluation.py)
+# Format "JSON lines" : une interaction par ligne, on ne fait qu'ajouter à la fin
+INTERACTIONS_FILE = "interactions.jsonl"
+
+
+# --- 4. VOISINS PRÉ-CALCULÉS (cf. neighbours.py) ---
+def weights_signature(weights):
+    # Empreinte des poids : si elle change, les voisins pré-calculés sont périmés
+    raw = json.dumps(weights, sort_keys=True)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+NEIGHBOURS_FILE = "neighbours.json"
+
+# Table déjà chargée : path -> (date de modif du fichier, table)
+_neighbour_tables = {}
+
+
+def load_neighbour_table(path=NEIGHBOURS_FILE):
+    # Relue seulement si neighbours.py l'a réécrite depuis la dernière fois
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cached = _neighbour_tables.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r") as f:
+        table = json.load(f)
+    _neighbour_tables[path] = (mtime, table)
+    return table
@@ -0,0 +1,210 @@
+import copy
+import functools
+import json
+import math
+import os
+import time
+import tracemalloc
+
+from common import INTERACTIONS_FILE, load_data
+from main import get_recommendations
+from neighbours import build_neighbour_table
+from scoring import DEFAULT_RANKING, compile_ranking
+
+
+# --- 1. CHARGEMENT DU JOURNAL ---
+def load_interactions(path=INTERACTIONS_FILE):
+    # Une interaction par ligne (cf. main.log_interaction)
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def interactions_from_history(users):
+    # Pas de journal ? On reconstruit un log à partir des historiques.
+    # L'historique est rempli dans l'ordre de lecture, donc la position
+    # sert de "timestamp" (approximation, mais l'ordre est respecté).
+    interactions = []
+    for user in users:
+        for pos, art_id in enumerate(user["history"]):
+            interactions.append(
+                {
+                    "user_id": user["user_id"],
+                    "article_id": art_id,
+                    "type": "read",
+                    "ts": pos,
+                }
+            )
+    return interactions
+
+
+# --- 2. DÉCOUPAGE TEMPOREL ---
+def split_by_time(interactions, train_ratio=0.8):
+    # On coupe à un instant T : tout ce qui est avant sert à "entraîner",
+    # tout ce qui est après est ce qu'on essaie de deviner
+    ordered = sorted(interactions, key=lambda x: x["ts"])
+    cut = int(len(ordered) * train_ratio)
+    return ordered[:cut], ordered[cut:]
+
+
+def build_train_users(users, train, test):
+    """
+    Copie des users dont l'historique = tout ce qu'on savait avant la coupure.
+    Le journal ne couvre pas forcément tout le passé (il a démarré après les
+    premières lectures) : on part donc de l'historique complet, on en retire
+    seulement les articles à deviner (vus après la coupure et pas avant),
+    puis on ajoute les interactions d'entraînement du journal.
+    (les poids, eux, contiennent déjà tout le passé : petite fuite acceptée)
+    Renvoie (train_users, held_out) : held_out = user_id -> articles à
+    deviner. Un article déjà vu avant la coupure (lu puis liké) n'en fait
+    pas partie, puisque get_recommendations ne peut pas le proposer.
+    """
+    train_ids = {}
+    for it in train:
+        hist = train_ids.setdefault(it["user_id"], [])
+        if it["article_id"] not in hist:
+            hist.append(it["article_id"])
+
+    held_out = {}
+    for it in test:
+        if it["article_id"] not in train_ids.get(it["user_id"], []):
+            held_out.setdefault(it["user_id"], set()).add(it["article_id"])
+
+    train_users = copy.deepcopy(users)
+    for user in train_users:
+        hidden = held_out.get(user["user_id"], set())
+        history = [a for a in user["history"] if a not in hidden]
+        for art_id in train_ids.get(user["user_id"], []):
+            if art_id not in history:
+                history.append(art_id)
+        user["history"] = history
+    return train_users, held_out
+
+
+# --- 3. MÉTRIQUES ---
+def hit_rate_at_k(recommended_ids, relevant_ids, k):
+    return 1.0 if any(r in relevant_ids for r in recommended_ids[:k]) else 0.0
+
+
+def ndcg_at_k(recommended_ids, relevant_ids, k):
+    dcg = 0.0
+    for rank, art_id in enumerate(recommended_ids[:k]):
+        if art_id in relevant_ids:
+            dcg += 1.0 / math.log2(rank + 2)
+
+    # Score idéal : tous les articles pertinents en tête de liste
+    ideal = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant_ids), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+# --- 4. REJEU D'UN MOTEUR ---
+def evaluate_engine(engine, train_users, articles, test_by_user, k=10, seed=0):
+    """
+    'engine' a la même signature que get_recommendations :
+    engine(user_id, users, articles, top_n=k, seed=seed, verbose=False)
+    -> (user, recos)
+    """
+    hits, ndcgs, latencies, peaks = [], [], [], []
+
+    # Tour de chauffe : chaque moteur remplit ses caches (history_index,
+    # clés de jitter, recompilation...) avant d'être chronométré. Sinon le
+    # premier moteur évalué paierait seul les caches froids.
+    for user_id in test_by_user:
+        engine(user_id, train_users, articles, top_n=k, seed=seed, verbose=False)
+
+    for user_id, relevant_ids in test_by_user.items():
+        # 1. Latence (sans tracemalloc, qui ralentit tout)
+        start = time.perf_counter()
+        user_obj, recos = engine(
+            user_id, train_users, articles, top_n=k, seed=seed, verbose=False
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        if not user_obj:
+            continue
+
+        # 2. Mémoire : on rejoue la même requête (même seed -> même résultat)
+        tracemalloc.start()
+        engine(user_id, train_users, articles, top_n=k, seed=seed, verbose=False)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+        recommended_ids = [r["id"] for r in recos]
+        hits.append(hit_rate_at_k(recommended_ids, relevant_ids, k))
+        ndcgs.append(ndcg_at_k(recommended_ids, relevant_ids, k))
+
+    n = len(hits)
+    return {
+        "users": n,
+        "hit_rate": sum(hits) / n if n else 0.0,
+        "ndcg": sum(ndcgs) / n if n else 0.0,
+        "latency_mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "peak_mem_kb": max(peaks) if peaks else 0.0,
+    }
+
+
+def run_evaluation(
+    engines, interactions, users, articles, k=10, train_ratio=0.8, seed=0
+):
+    train, test = split_by_time(interactions, train_ratio)
+    # Les users sans rien de nouveau à deviner ne sont pas évalués
+    train_users, test_by_user = build_train_users(users, train, test)
+
+    results = {}
+    for name, engine in engines.items():
+        results[name] = evaluate_engine(
+            engine, train_users, articles, test_by_user, k=k, seed=seed
+        )
+    return results
+
+
+# --- 5. AFFICHAGE ---
+def print_evaluation_report(results, k=10):
+    print(f"\n{'=' * 90}")
+    print(f" 📏 ÉVALUATION HORS-LIGNE (k={k})")
+    print(f"{'=' * 90}")
+    print(
+        f"   {'MOTEUR':<20} | {'USERS':<5} | {'HIT@K':<6} | {'NDCG@K':<6} | "
+        f"{'MOY ms':<7} | {'P50 ms':<7} | {'P95 ms':<7} | {'PIC KB'}"
+    )
+    print(f"   {'-' * 85}")
+    for name, r in results.items():
+        print(
+            f"   {name:<20} | {r['users']:<5} | {r['hit_rate']:<6.3f} | {r['ndcg']:<6.3f} | "
+            f"{r['latency_mean_ms']:<7.2f} | {r['latency_p50_ms']:<7.2f} | "
+            f"{r['latency_p95_ms']:<7.2f} | {r['peak_mem_kb']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    users, articles = load_data()
+
+    if os.path.exists(INTERACTIONS_FILE):
+        interactions = load_interactions()
+    else:
+        print("⚠️  Pas de journal d'interactions : on rejoue les historiques.")
+        interactions = interactions_from_history(users)
+
+    # Moteurs comparés (même signature que get_recommendations)
+    engines = {
+        "reference": get_recommendations,
+        "voisins_precalc": functools.partial(
+            get_recommendations, neighbour_table=build_neighbour_table(users)
+        ),
+        "scoring_compile": functools.partial(
+            get_recommendations,
+            ranking=compile_ranking(DEFAULT_RANKING, articles),
+        ),
+    }
+
+    results = run_evaluation(engines, interactions, users, articles, k=10)
+    print_evaluation_report(results, k=10)
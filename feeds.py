@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+import time
+
+from common import (
+    INTERACTIONS_FILE,
+    load_data,
+    load_neighbour_table,
+    silent,
+    weights_signature,
+)
+
+# --- FEEDS PRÉ-CALCULÉS ---
+# Un scheduler calcule en tâche de fond le top-N de chaque user ACTIF (une
+# interaction récente dans le journal) et le range dans feeds/<user_id>.json.
+# Un fichier par user : la requête ne lit que le sien, et un passage du
+# scheduler ne réécrit que les feeds qu'il a recalculés.
+# La requête sert ce feed s'il est encore valable ; sinon (feed périmé, ou
+# user inactif qui n'a pas de feed) elle retombe sur le calcul en direct.
+# 'recommend' = main.get_recommendations, passé en paramètre : ce module
+# n'importe pas main.py (qui l'importe, lui).
+
+FEEDS_DIR = "feeds"
+FEED_SIZE = 10
+# Seuls les users avec une interaction depuis moins de ACTIVE_WINDOW secondes
+# ont un feed pré-calculé
+ACTIVE_WINDOW = 7 * 24 * 3600
+# Au-delà de cet âge (secondes), un feed est rafraîchi même si rien n'a bougé
+MAX_FEED_AGE = 6 * 3600
+# Pause entre deux passages du scheduler, et nb de users max par passage
+REFRESH_INTERVAL = 60
+REFRESH_BATCH = 100
+
+
+# --- 1. LECTURE / ÉCRITURE ---
+def feed_path(user_id, feeds_dir=FEEDS_DIR):
+    return os.path.join(feeds_dir, f"{user_id}.json")
+
+
+def load_feed(user_id, feeds_dir=FEEDS_DIR):
+    try:
+        with open(feed_path(user_id, feeds_dir), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_feed(user_id, entry, feeds_dir=FEEDS_DIR):
+    # Fichier temporaire + remplacement : un lecteur ne voit jamais un JSON coupé
+    # (pid dans le nom : le scheduler du menu et `python main.py feeds` peuvent
+    # tourner en même temps)
+    os.makedirs(feeds_dir, exist_ok=True)
+    path = feed_path(user_id, feeds_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+
+# Lecture incrémentale du journal : path -> [octets déjà lus, {user_id: ts}]
+_activity_state = {}
+
+
+def last_activity(path=INTERACTIONS_FILE):
+    # user_id -> timestamp de sa dernière interaction (cf. log_interaction).
+    # Le journal ne fait que grossir : on ne lit que les lignes ajoutées
+    # depuis le passage précédent.
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return {}
+
+    state = _activity_state.setdefault(path, [0, {}])
+    if size < state[0]:
+        # Journal tronqué ou remplacé : on repart du début
+        state[0], state[1] = 0, {}
+
+    activity = state[1]
+    with open(path, "rb") as f:
+        f.seek(state[0])
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Ligne en cours d'écriture : on la relira au prochain tour
+            state[0] += len(line)
+            if not line.strip():
+                continue
+            it = json.loads(line)
+            if it["ts"] > activity.get(it["user_id"], 0):
+                activity[it["user_id"]] = it["ts"]
+    return dict(activity)
+
+
+# --- 2. FRAÎCHEUR ET PRIORITÉ ---
+def feed_state(user):
+    # Ce qui, s'il change, rend le feed faux : les poids (interaction, decay)
+    # et l'historique (un article lu ne doit plus être proposé)
+    return {
+        "sig": weights_signature(user["weights"]),
+        "history_len": len(user["history"]),
+    }
+
+
+def is_feed_fresh(entry, user, now=None):
+    if not entry:
+        return False
+    now = now or time.time()
+    state = feed_state(user)
+    return (
+        entry["sig"] == state["sig"]
+        and entry["history_len"] == state["history_len"]
+        and now - entry["computed_at"] < MAX_FEED_AGE
+    )
+
+
+def active_users(users, activity, now=None, window=ACTIVE_WINDOW):
+    # Jamais vu dans le journal = inactif (timestamp 0)
+    now = now or time.time()
+    return [u for u in users if now - activity.get(u["user_id"], 0) < window]
+
+
+def refresh_priority(users, feeds, activity, now=None):
+    """
+    Ordre de rafraîchissement (des users actifs) :
+      1. les feeds périmés (ou absents) avant les feeds encore bons,
+      2. parmi eux, les users les plus récemment actifs d'abord,
+      3. puis les feeds les plus vieux.
+    """
+    now = now or time.time()
+
+    def priority(user):
+        entry = feeds.get(user["user_id"])
+        stale = not is_feed_fresh(entry, user, now)
+        computed_at = entry["computed_at"] if entry else 0
+        return (not stale, -activity.get(user["user_id"], 0), computed_at)
+
+    return sorted(users, key=priority)
+
+
+# --- 3. MATÉRIALISATION ---
+def refresh_feeds(recommend, max_users=REFRESH_BATCH, top_n=FEED_SIZE, seed=None):
+    users, articles = load_data()
+    activity = last_activity()
+    now = time.time()
+
+    neighbour_table = load_neighbour_table()
+
+    # Les users inactifs ne sont pas matérialisés : servis en direct.
+    # On ne lit que les feeds des users actifs.
+    active = active_users(users, activity, now)
+    feeds = {u["user_id"]: load_feed(u["user_id"]) for u in active}
+    ordered = refresh_priority(active, feeds, activity, now)
+    refreshed = 0
+    for user in ordered[:max_users]:
+        # Les feeds encore bons sont en fin de liste : on s'arrête au premier
+        if is_feed_fresh(feeds.get(user["user_id"]), user, now):
+            break
+
+        # Pas d'affichage en tâche de fond (le menu tourne à côté)
+        _, recos = recommend(
+            user["user_id"],
+            users,
+            articles,
+            top_n=top_n,
+            seed=seed,
+            neighbour_table=neighbour_table,
+            verbose=False,
+        )
+
+        save_feed(
+            user["user_id"],
+            {**feed_state(user), "computed_at": time.time(), "items": recos},
+        )
+        refreshed += 1
+
+    return refreshed
+
+
+# --- 4. CHEMIN DE REQUÊTE ---
+def serve_feed(
+    user_id, all_users, all_articles, recommend, top_n=FEED_SIZE, neighbour_table=None
+):
+    # Même retour que get_recommendations : (user, liste)
+    target_user = next((u for u in all_users if u["user_id"] == user_id), None)
+    entry = load_feed(user_id)
+
+    if (
+        target_user
+        and is_feed_fresh(entry, target_user)
+        and len(entry["items"]) >= top_n
+    ):
+        print(f"⚡ Feed pré-calculé servi pour {target_user['name']}")
+        return target_user, entry["items"][:top_n]
+
+    # Pas de feed valable : calcul en direct
+    return recommend(
+        user_id,
+        all_users,
+        all_articles,
+        top_n=top_n,
+        neighbour_table=neighbour_table,
+    )
+
+
+# --- 5. SCHEDULER EN TÂCHE DE FOND ---
+def feed_scheduler_loop(
+    recommend, stop_event, interval=REFRESH_INTERVAL, batch=REFRESH_BATCH, verbose=False
+):
+    # verbose=False quand le scheduler tourne à côté du menu interactif
+    log = print if verbose else silent
+    while not stop_event.is_set():
+        try:
+            refreshed = refresh_feeds(recommend, max_users=batch)
+            if refreshed:
+                log(f"🔄 Feeds : {refreshed} users rafraîchis.")
+        except (OSError, ValueError) as e:
+            # Fichier en cours d'écriture / JSON invalide : on retentera au prochain tour
+            log(f"⚠️ Feeds : passage annulé ({e})")
+        stop_event.wait(interval)
+
+
+def start_feed_scheduler(
+    recommend, interval=REFRESH_INTERVAL, batch=REFRESH_BATCH, verbose=False
+):
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=feed_scheduler_loop,
+        args=(recommend, stop_event, interval, batch, verbose),
+        daemon=True,
+    )
+    thread.start()
+    return thread, stop_event
+
+
+def run_feed_scheduler(recommend):
+    # Scheduler seul (python main.py feeds) : on affiche chaque passage
+    thread, stop_event = start_feed_scheduler(recommend, verbose=True)
+    print("🕒 Scheduler de feeds lancé (Ctrl+C pour arrêter).")
+    try:
+        while thread.is_alive():
+            thread.join(1)
+    except KeyboardInterrupt:
+        stop_event.set()
+        thread.join()
+        print("Arrêt du scheduler. Bye ! 👋")
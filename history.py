@@ -0,0 +1,125 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+# --- HISTORIQUE COMPACT ---
+# Dans users.json l'historique reste une liste d'IDs d'articles (c'est l'API
+# que tout le reste du code utilise). En mémoire, on le convertit en tableau
+# trié d'entiers (array('I'), 4 octets par article lu) :
+#   - "ce qu'il a lu et pas moi" = différence de deux tableaux d'entiers
+#   - "déjà lu ?" = recherche dichotomique, sans construire de set de strings
+# Chaque ID reçoit un index entier via un registre (n'importe quel format
+# d'ID est accepté). load_data enregistre le catalogue en premier, donc
+# l'ordre des index = l'ordre des articles dans articles.json.
+
+# Nombre max d'articles gardés dans l'historique (None = illimité)
+HISTORY_RETENTION = None
+
+# Nombre max d'historiques convertis gardés en cache (les plus récents)
+HISTORY_CACHE_SIZE = 10_000
+
+_index_of = {}
+_ids = []
+_registry_lock = threading.Lock()
+
+# Cache LRU : user_id -> (liste history d'origine, taille, premier, dernier, index)
+# On garde la liste elle-même pour vérifier qu'on parle bien du même objet.
+_index_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def article_index(article_id):
+    idx = _index_of.get(article_id)
+    if idx is None:
+        with _registry_lock:
+            idx = _index_of.get(article_id)
+            if idx is None:
+                idx = len(_ids)
+                _ids.append(article_id)
+                _index_of[article_id] = idx
+    return idx
+
+
+def register_articles(articles):
+    for article in articles:
+        article_index(article["article_id"])
+
+
+def ids_to_index(article_ids):
+    return array("I", sorted({article_index(a) for a in article_ids}))
+
+
+def index_to_ids(index):
+    return [_ids[i] for i in index]
+
+
+def history_index(user):
+    history = user["history"]
+    if not history:
+        return array("I")
+
+    with _cache_lock:
+        cached = _index_cache.get(user["user_id"])
+        if (
+            cached
+            and cached[0] is history
+            and cached[1] == len(history)
+            and cached[2] == history[0]
+            and cached[3] == history[-1]
+        ):
+            _index_cache.move_to_end(user["user_id"])
+            return cached[4]
+
+    index = ids_to_index(history)
+    with _cache_lock:
+        _index_cache[user["user_id"]] = (
+            history,
+            len(history),
+            history[0],
+            history[-1],
+            index,
+        )
+        _index_cache.move_to_end(user["user_id"])
+        while len(_index_cache) > HISTORY_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def has_read(index, article_id):
+    # Un ID jamais vu n'est dans aucun historique (et on ne l'enregistre pas)
+    idx = _index_of.get(article_id)
+    if idx is None:
+        return False
+    pos = bisect_left(index, idx)
+    return pos < len(index) and index[pos] == idx
+
+
+def sorted_difference(theirs, mine):
+    # theirs - mine pour deux tableaux triés sans doublons : un seul passage
+    # en parallèle sur les deux (fusion), sans construire de set
+    out = array("I")
+    j, n = 0, len(mine)
+    for idx in theirs:
+        while j < n and mine[j] < idx:
+            j += 1
+        if j == n or mine[j] != idx:
+            out.append(idx)
+    return out
+
+
+def new_items(candidate, target_user):
+    # Les articles lus par 'candidate' que 'target_user' n'a PAS lus,
+    # dans l'ordre des index (= ordre du catalogue)
+    mine = history_index(target_user)
+    theirs = history_index(candidate)
+    return index_to_ids(sorted_difference(theirs, mine))
+
+
+def trim_history(history, retention=None):
+    # Fenêtre de rétention : on ne garde que les lectures les plus récentes
+    if retention is None:
+        retention = HISTORY_RETENTION
+    if retention is None or len(history) <= retention:
+        return history
+    return history[-retention:]
@@ -1,19 +1,32 @@
 import json
 import random
+import sys
+import time
 from re import PatternError
 
+from common import (
+    DEFAULT_SLOTS,
+    INTERACTIONS_FILE,
+    article_jitter,
+    load_data,
+    load_neighbour_table,
+    request_rng,
+    silent,
+    weights_signature,
+)
+from feeds import run_feed_scheduler, serve_feed, start_feed_scheduler
+from history import has_read, history_index, new_items, trim_history
+from maintenance import run_maintenance
 
 # --- 1. CHARGEMENT DES DONNÉES ---
-def load_data():
-    with open("users.json", "r") as f:
-        users = json.load(f)
-    with open("articles.json", "r") as f:
-        articles = json.load(f)
-    return users, articles
+# load_data, les clés de jitter et la lecture de la table des voisins sont
+# dans common.py (partagés avec feeds.py, neighbours.py et scoring.py).
 
 
 # --- 2. LE CERVEAU (Fonction de Scoring) ---
-def calculate_score(user, article):
+# Version de référence, article par article. Pour les variantes configurables
+# (A/B tests) compilées en NumPy, voir scoring.py.
+def calculate_score(user, article, seed=None, epoch=0):
     score = 0
 
     # A. Score d'Affinité (Tags)
@@ -45,20 +58,34 @@ def calculate_score(user, article):
 
     # C. Jitter (Aléatoire pour la découverte)
     # Ajoute un petit flou pour que les listes ne soient pas figées
-    score += random.uniform(0, 0.2)
+    score += article_jitter(user["user_id"], article["article_id"], epoch, seed)
 
     return round(score, 2)
 
 
 # --- 3. GÉNÉRATEUR DE LISTE ---
-def get_recommendations(user_id, all_users, all_articles, top_n=10):
+def get_recommendations(
+    user_id,
+    all_users,
+    all_articles,
+    top_n=10,
+    seed=None,
+    epoch=0,
+    neighbour_table=None,
+    ranking=None,
+    verbose=True,
+):
+    # verbose=False : aucun affichage (tâches de fond, évaluation). On ne
+    # touche pas à sys.stdout, qui est partagé par tous les threads.
+    log = print if verbose else silent
+
     # 1. Trouver le bon utilisateur
     target_user = next((u for u in all_users if u["user_id"] == user_id), None)
     if not target_user:
-        print("❌ Erreur: Utilisateur introuvable.")
+        log("❌ Erreur: Utilisateur introuvable.")
         return [], None  # Attention: je renvoie une liste vide ET None pour user_obj
 
-    print(f"\n🔍 --- DEBUG ALGO pour {target_user['name']} ---")
+    log(f"\n🔍 --- DEBUG ALGO pour {target_user['name']} ---")
 
     # --- LISTES TEMPORAIRES ---
     pertinence_list = []
@@ -68,11 +95,23 @@ def get_recommendations(user_id, all_users, all_articles, top_n=10):
     # ==========================================
     # 1. PERTINENCE (CONTENT-BASED) -> Objectif ~70%
     # ==========================================
-    for article in all_articles:
-        if article["article_id"] in target_user["history"]:
-            continue
+    slots = ranking.slots if ranking else DEFAULT_SLOTS
+
+    if ranking:
+        # Variante compilée (scoring.py) : tout le catalogue scoré d'un coup,
+        # déjà trié. On ne garde que ce qui peut servir (liste + comblage).
+        # Si all_articles n'est plus le catalogue compilé, on recompile.
+        ranking = ranking.for_articles(all_articles)
+        scored = ranking.rank(target_user, 2 * top_n, seed, epoch)
+    else:
+        my_index = history_index(target_user)
+        scored = [
+            (article, calculate_score(target_user, article, seed, epoch))
+            for article in all_articles
+            if not has_read(my_index, article["article_id"])
+        ]
 
-        score = calculate_score(target_user, article)
+    for article, score in scored:
         pertinence_list.append(
             {
                 "id": article["article_id"],
@@ -86,9 +125,9 @@ def get_recommendations(user_id, all_users, all_articles, top_n=10):
 
     # On trie et on prend les meilleurs
     pertinence_list.sort(key=lambda x: x["score"], reverse=True)
-    nb_pertinent = int(0.7 * top_n)  # 7 articles sur 10
+    nb_pertinent = int(slots["pertinence"] * top_n)  # 7 articles sur 10
     final_pertinent = pertinence_list[:nb_pertinent]
-    print(
+    log(
         f"✅ Pertinence : {len(final_pertinent)} articles sélectionnés (Top score: {final_pertinent[0]['score'] if final_pertinent else 0})"
     )
 
@@ -96,17 +135,18 @@ def get_recommendations(user_id, all_users, all_articles, top_n=10):
     # 2. COLLABORATION (USER-BASED) -> Objectif ~15%
     # ==========================================
     jumeau, dist, new_items_ids = finding_useful_jumeau(
-        target_user, all_users, min_history_len=1
+        target_user, all_users, min_history_len=1, neighbour_table=neighbour_table
     )
 
-    nb_collab = int(0.15 * top_n)  # ~1 ou 2 articles
+    nb_collab = int(slots["collab"] * top_n)  # ~1 ou 2 articles
     collab_list = []
 
     if jumeau:
-        print(f"👯 Jumeau UTILE trouvé : {jumeau['name']} (Dist: {round(dist, 2)})")
-        print(f"   -> Il a {len(new_items_ids)} articles nouveaux pour nous.")
+        log(f"👯 Jumeau UTILE trouvé : {jumeau['name']} (Dist: {round(dist, 2)})")
+        log(f"   -> Il a {len(new_items_ids)} articles nouveaux pour nous.")
 
         # On transforme les IDs en objets articles complets
+        # (liste triée par index d'article -> même ordre à chaque run)
         for art_id in new_items_ids:
             # On vérifie que ce n'est pas déjà dans la liste de pertinence
             if any(p["id"] == art_id for p in final_pertinent):
@@ -130,10 +170,10 @@ def get_recommendations(user_id, all_users, all_articles, top_n=10):
 
         # On coupe si on en a trop
         collab_list = collab_list[:nb_collab]
-        print(f"✅ Collaboration : {len(collab_list)} articles ajoutés.")
+        log(f"✅ Collaboration : {len(collab_list)} articles ajoutés.")
 
     else:
-        print("⚠️ Collaboration : Aucun voisin n'a d'historique pertinent à partager.")
+        log("⚠️ Collaboration : Aucun voisin n'a d'historique pertinent à partager.")
 
     # ==========================================
     # 3. DÉCOUVERTE (ALEATOIRE CONTROLÉ) -> Objectif ~15% + Reste
@@ -163,23 +203,29 @@ def get_recommendations(user_id, all_users, all_articles, top_n=10):
 
         if candidates:
             # On pioche au hasard
-            picked = random.sample(candidates, min(slots_needed, len(candidates)))
-            for a in picked:
+            # (flux dédié à la requête si une seed est fournie -> rejouable)
+            rng = request_rng(user_id, epoch, seed)
+            picked = rng.sample(candidates, min(slots_needed, len(candidates)))
+            if ranking:
+                picked_scores = ranking.score_articles(target_user, picked, seed, epoch)
+            else:
+                picked_scores = [
+                    calculate_score(target_user, a, seed, epoch) for a in picked
+                ]
+            for a, score in zip(picked, picked_scores):
                 discovery_list.append(
                     {
                         "id": a["article_id"],
                         "title": a["title"],
                         "tags": a["tags"],
                         "level": a["level"],
-                        "score": calculate_score(
-                            target_user, a
-                        ),  # Score nul mais c'est pas grave
+                        "score": score,  # Score nul mais c'est pas grave
                         "type": "🌟 DÉCOUVERTE",
                     }
                 )
-            print(f"✅ Découverte : {len(discovery_list)} articles injectés.")
+            log(f"✅ Découverte : {len(discovery_list)} articles injectés.")
         else:
-            print("⚠️ Découverte : Pas assez d'articles candidats.")
+            log("⚠️ Découverte : Pas assez d'articles candidats.")
 
     # ==========================================
     # 4. ASSEMBLAGE FINAL
@@ -189,15 +235,28 @@ def get_recommendations(user_id, all_users, all_articles, top_n=10):
 
     # Sécurité : Si on n'a pas atteint top_n (cas rare), on comble avec du pertinent
     if len(final_list) < top_n:
-        print("🔧 Comblage : On ajoute plus d'articles pertinents pour finir la liste.")
+        log("🔧 Comblage : On ajoute plus d'articles pertinents pour finir la liste.")
         used_ids = {a["id"] for a in final_list}
         rest = [a for a in pertinence_list if a["id"] not in used_ids]
         final_list.extend(rest[: top_n - len(final_list)])
 
-    print("-----------------------------------")
+    log("-----------------------------------")
     return target_user, final_list
 
 
+def log_interaction(user_id, article_id, interaction_type):
+    line = json.dumps(
+        {
+            "user_id": user_id,
+            "article_id": article_id,
+            "type": interaction_type,
+            "ts": time.time(),
+        }
+    )
+    with open(INTERACTIONS_FILE, "a") as f:
+        f.write(line + "\n")
+
+
 def simulate_interaction(user_id, article_id, interaction_type):
 
     # Chargement
@@ -235,6 +294,8 @@ def simulate_interaction(user_id, article_id, interaction_type):
                 # 2. Mise à jour de l'historique (SANS DUPLICATION)
                 if article_id not in user["history"]:
                     user["history"].append(article_id)
+                    # Fenêtre de rétention (cf. history.HISTORY_RETENTION)
+                    user["history"] = trim_history(user["history"])
                     print("   -> Ajouté à l'historique de lecture.")
                 else:
                     print("   -> Déjà dans l'historique (pas de doublon).")
@@ -242,6 +303,7 @@ def simulate_interaction(user_id, article_id, interaction_type):
                 # 3. Sauvegarde immédiate
                 with open("users.json", "w") as f:
                     json.dump(users, f, indent=4)
+                log_interaction(user_id, article_id, interaction_type)
                 break
     elif interaction_type == "like":
         addedPoints = 0.3  # Le like vaut plus que la lecture simple
@@ -261,6 +323,7 @@ def simulate_interaction(user_id, article_id, interaction_type):
                 # 2. Sauvegarde immédiate
                 with open("users.json", "w") as f:
                     json.dump(users, f, indent=4)
+                log_interaction(user_id, article_id, interaction_type)
                 break
     elif interaction_type == "quiz":
         addedPoints = 0.5
@@ -280,27 +343,16 @@ def simulate_interaction(user_id, article_id, interaction_type):
                 # 2. Sauvegarde immédiate
                 with open("users.json", "w") as f:
                     json.dump(users, f, indent=4)
+                log_interaction(user_id, article_id, interaction_type)
                 break
 
 
 # ajouter une degradation des poids
 def apply_time_decay():
-    DECAY_FACTOR = 0.95  # On perd 5% d'intérêt par "cycle" (semaine/jour)
-
-    with open("users.json", "r") as f:
-        users = json.load(f)
-
+    # Passage en streaming, chunk par chunk (cf. maintenance.py) :
+    # on ne charge plus tous les users en mémoire d'un coup
     print("\n⏳ Passage du temps (Decay)...")
-    for user in users:
-        print(f"   User {user['user_id']} : ", end="")
-        for tag, weight in user["weights"].items():
-            # On ne descend pas en dessous de 0.1 pour garder une trace
-            new_weight = max(0.1, round(weight * DECAY_FACTOR, 2))
-            user["weights"][tag] = new_weight
-        print("Poids mis à jour.")
-
-    with open("users.json", "w") as f:
-        json.dump(users, f, indent=4)
+    run_maintenance(["decay"], workers=1)
     print("✅ Temps écoulé : Tous les intérêts ont légèrement baissé.")
 
 
@@ -342,11 +394,76 @@ def finding_jumeau(target_user, all_users):
     return best_jumeau
 
 
-def finding_useful_jumeau(target_user, all_users, min_history_len=1):
+def neighbour_user(neighbour_table, all_users, other_id):
+    # La table garde la position de chaque user dans users.json :
+    # on vérifie juste que c'est toujours le bon (O(1), pas de scan des U users)
+    pos = neighbour_table.get("pos", {}).get(other_id)
+    if pos is not None and pos < len(all_users):
+        if all_users[pos]["user_id"] == other_id:
+            return all_users[pos]
+
+    # Positions décalées (users ajoutés/supprimés) : index construit une seule
+    # fois pour cette liste de users, et rangé à côté de la table
+    cached = neighbour_table.get("_users_by_id")
+    if not cached or cached[0] is not all_users or cached[1] != len(all_users):
+        cached = (all_users, len(all_users), {u["user_id"]: u for u in all_users})
+        neighbour_table["_users_by_id"] = cached
+    return cached[2].get(other_id)
+
+
+def neighbour_candidates(target_user, all_users, neighbour_table):
+    """
+    Lit les voisins pré-calculés (cf. neighbours.py) au lieu de recalculer
+    U distances. Renvoie None si la ligne du user est absente ou périmée.
+    """
+    entry = neighbour_table["users"].get(target_user["user_id"])
+    if not entry or entry["sig"] != weights_signature(target_user["weights"]):
+        return None
+
+    candidates = []
+    for other_id, dist in entry["neighbours"]:
+        other_user = neighbour_user(neighbour_table, all_users, other_id)
+        if other_user:
+            candidates.append((dist, other_user))
+    return candidates
+
+
+def pick_useful_jumeau(candidates, target_user, min_history_len=1):
+    # On parcourt la liste (triée par distance) pour trouver le premier "Utile"
+    for dist, candidate in candidates:
+        # A-t-il un historique ?
+        if not candidate["history"]:
+            continue
+
+        # A-t-il lu des trucs que JE n'ai pas lus ?
+        # (C'est inutile de prendre un jumeau qui a lu exactement les mêmes livres que moi)
+        # -> différence de tableaux d'index, sans reconstruire de set de strings
+        candidate_new_items = new_items(candidate, target_user)
+
+        if len(candidate_new_items) >= min_history_len:
+            # BINGO ! C'est lui le meilleur jumeau utile
+            return candidate, dist, candidate_new_items
+
+    # Si personne n'a rien d'intéressant à proposer
+    return None, 0, []
+
+
+def finding_useful_jumeau(
+    target_user, all_users, min_history_len=1, neighbour_table=None
+):
     """
     Trouve l'utilisateur le plus proche qui a lu au moins 'min_history_len' articles
     que le target_user n'a PAS encore lus.
     """
+    # 0. Raccourci : la table des voisins pré-calculés (top-K seulement).
+    # Si aucun des K voisins n'est utile, on retombe sur le calcul complet.
+    if neighbour_table is not None:
+        candidates = neighbour_candidates(target_user, all_users, neighbour_table)
+        if candidates is not None:
+            found = pick_useful_jumeau(candidates, target_user, min_history_len)
+            if found[0]:
+                return found
+
     candidates = []
 
     # 1. On calcule la distance avec TOUS les autres utilisateurs
@@ -362,40 +479,17 @@ def finding_useful_jumeau(target_user, all_users, min_history_len=1):
     candidates.sort(key=lambda x: x[0])
 
     # 3. On parcourt la liste pour trouver le premier "Utile"
-    my_history = set(target_user["history"])
+    return pick_useful_jumeau(candidates, target_user, min_history_len)
 
-    for dist, candidate in candidates:
-        # A-t-il un historique ?
-        if not candidate["history"]:
-            continue
-
-        candidate_history = set(candidate["history"])
-
-        # A-t-il lu des trucs que JE n'ai pas lus ?
-        # (C'est inutile de prendre un jumeau qui a lu exactement les mêmes livres que moi)
-        new_items = candidate_history - my_history
-
-        if len(new_items) >= min_history_len:
-            # BINGO ! C'est lui le meilleur jumeau utile
-            return candidate, dist, new_items
 
-    # Si personne n'a rien d'intéressant à proposer
-    return None, 0, []
-
-
-def collaborative_filtering(target_user, jumeau, all_articles):
+def collaborative_filtering(target_user, jumeau, all_articles, seed=None, epoch=0):
     reco_collab = []
 
     if not jumeau or not jumeau.get("history"):
         return []
 
-    # Les IDs que le jumeau a lus
-    jumeau_history_ids = set(jumeau["history"])
-    # Les IDs que j'ai lus
-    my_history_ids = set(target_user["history"])
-
     # La différence : Ce qu'il a lu ET que je n'ai PAS lu
-    ids_to_recommend = jumeau_history_ids - my_history_ids
+    ids_to_recommend = new_items(jumeau, target_user)
 
     for art_id in ids_to_recommend:
         # On doit retrouver l'objet article complet dans la liste all_articles
@@ -410,7 +504,7 @@ def collaborative_filtering(target_user, jumeau, all_articles):
                     "title": article_obj["title"],
                     "tags": article_obj["tags"],
                     "level": article_obj["level"],
-                    "score": calculate_score(target_user, article_obj),
+                    "score": calculate_score(target_user, article_obj, seed, epoch),
                     "type": f"🤝 Lu par {jumeau['name']}",  # Petit bonus visuel
                 }
             )
@@ -648,11 +742,20 @@ def onboard_user_hybrid():
 
 # --- 5. EXÉCUTION DU SCÉNARIO ---
 if __name__ == "__main__":
+    # python main.py feeds : le scheduler de feeds seul, sans le menu
+    if sys.argv[1:] == ["feeds"]:
+        run_feed_scheduler(get_recommendations)
+        sys.exit()
+
     # Initialisation
     test_user_id = "user_0"
     test_article_id = "article_0"
     # adding something
 
+    # Les feeds sont pré-calculés en tâche de fond pendant qu'on joue avec le menu
+    # (ou à part, sans le menu : python main.py feeds)
+    start_feed_scheduler(get_recommendations)
+
     # On charge une première fois
     users, articles = load_data()
 
@@ -698,7 +801,15 @@ if __name__ == "__main__":
             # CRUCIAL : On recharge les données pour être sûr d'avoir les derniers poids
             users, articles = load_data()
 
-            user_obj, recos = get_recommendations(test_user_id, users, articles)
+            # Feed pré-calculé s'il est encore bon, sinon calcul en direct
+            # (avec les voisins pré-calculés si `python neighbours.py` a été lancé)
+            user_obj, recos = serve_feed(
+                test_user_id,
+                users,
+                articles,
+                get_recommendations,
+                neighbour_table=load_neighbour_table(),
+            )
 
             if user_obj:
                 print_separator(f"RECOMMANDATIONS POUR {user_obj['name']}")
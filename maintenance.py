@@ -0,0 +1,308 @@
+import json
+import multiprocessing
+import os
+import sys
+import textwrap
+import time
+from collections import deque
+
+from history import trim_history
+
+# --- JOBS DE MAINTENANCE EN STREAMING ---
+# users.json est lu user par user (jamais chargé en entier), traité par
+# paquets ("chunks") éventuellement en parallèle, et réécrit au fil de l'eau
+# dans un fichier temporaire. Un checkpoint après chaque chunk permet de
+# reprendre là où on s'était arrêté si le job est interrompu.
+# ⚠️ Pendant le job, les écritures d'autres process dans users.json sont perdues.
+
+USERS_FILE = "users.json"
+ARTICLES_FILE = "articles.json"
+CHUNK_SIZE = 10_000
+READ_SIZE = 1 << 16  # 64 Ko lus à la fois
+
+DECAY_FACTOR = 0.95  # On perd 5% d'intérêt par "cycle" (semaine/jour)
+WEIGHT_MIN = 0.1  # On ne descend pas en dessous pour garder une trace
+WEIGHT_CAP = 5.0  # Normalisation : le poids max d'un user est ramené à ce plafond
+MASTERY_MAX = 3
+MASTERY_STEP = 5  # Nb d'articles lus à son niveau pour passer au suivant
+
+
+# --- 1. LECTURE / ÉCRITURE EN STREAMING ---
+def iter_users(path=USERS_FILE, read_size=READ_SIZE):
+    # Parcourt un tableau JSON élément par élément, en gardant en mémoire
+    # seulement le morceau de fichier pas encore décodé
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        started = False
+
+        while True:
+            # On saute les blancs et les virgules entre deux users
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos == len(buf):
+                if eof:
+                    raise ValueError(f"{path} : fin de fichier inattendue")
+                buf = f.read(read_size)
+                pos = 0
+                eof = not buf
+                continue
+
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path} : un tableau JSON est attendu")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                return
+
+            try:
+                user, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # User coupé en deux par la lecture : on lit la suite
+                more = f.read(read_size)
+                if not more:
+                    raise
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            yield user
+            # On avance simplement : le buffer n'est recopié (sans ce qui a déjà
+            # été décodé) qu'au moment de lire la suite du fichier
+            pos = end
+
+
+def iter_user_chunks(path=USERS_FILE, chunk_size=CHUNK_SIZE):
+    chunk = []
+    for user in iter_users(path):
+        chunk.append(user)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def format_users(users, first):
+    # Même mise en forme que json.dump(users, f, indent=4)
+    parts = [textwrap.indent(json.dumps(u, indent=4), "    ") for u in users]
+    text = ",\n".join(parts)
+    return ("\n" if first else ",\n") + text
+
+
+# --- 2. LES JOBS (un user à la fois, modifié en place) ---
+def decay_user(user, context):
+    for tag, weight in user["weights"].items():
+        user["weights"][tag] = max(WEIGHT_MIN, round(weight * DECAY_FACTOR, 2))
+
+
+def normalize_user(user, context):
+    # Les interactions font grimper les poids sans limite : on ramène le plus
+    # gros à WEIGHT_CAP en gardant les proportions entre tags
+    if not user["weights"]:
+        return
+    top = max(user["weights"].values())
+    if top <= WEIGHT_CAP:
+        return
+    ratio = WEIGHT_CAP / top
+    for tag, weight in user["weights"].items():
+        user["weights"][tag] = max(WEIGHT_MIN, round(weight * ratio, 2))
+
+
+def mastery_user(user, context):
+    # Progression : MASTERY_STEP articles lus à son niveau sur un tag
+    # (tag principal de l'article) -> niveau suivant. On ne redescend jamais.
+    reads = {}
+    for art_id in user["history"]:
+        info = context["articles"].get(art_id)
+        if info:
+            main_tag, level = info
+            reads[(main_tag, level)] = reads.get((main_tag, level), 0) + 1
+
+    for tag in {t for t, _ in reads}:
+        lvl = user["mastery"].get(tag, 1)
+        while lvl < MASTERY_MAX and reads.get((tag, lvl), 0) >= MASTERY_STEP:
+            lvl += 1
+        user["mastery"][tag] = lvl
+
+
+def compact_history_user(user, context):
+    # Doublons retirés (en gardant la 1ère lecture) + fenêtre de rétention
+    user["history"] = trim_history(list(dict.fromkeys(user["history"])))
+
+
+MAINTENANCE_JOBS = {
+    "decay": decay_user,
+    "normalize": normalize_user,
+    "mastery": mastery_user,
+    "compact_history": compact_history_user,
+}
+
+
+# --- 3. TRAITEMENT D'UN CHUNK (dans un process worker) ---
+_worker_context = None
+
+
+def load_context(jobs):
+    context = {"articles": {}}
+    if "mastery" in jobs:
+        with open(ARTICLES_FILE, "r") as f:
+            articles = json.load(f)
+        context["articles"] = {
+            a["article_id"]: (a["tags"][0], a["level"]) for a in articles
+        }
+    return context
+
+
+def init_worker(jobs):
+    global _worker_context
+    _worker_context = load_context(jobs)
+
+
+def process_chunk(jobs, chunk):
+    for user in chunk:
+        for job in jobs:
+            MAINTENANCE_JOBS[job](user, _worker_context)
+    return chunk
+
+
+# --- 4. CHECKPOINTS ---
+def source_fingerprint(path):
+    # Taille + date de modif : si users.json a été réécrit entre-temps
+    # (interaction, onboarding...), on le voit
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_checkpoint(path, jobs, chunk_size, source):
+    try:
+        with open(path, "r") as f:
+            ckpt = json.load(f)
+    except FileNotFoundError:
+        return None
+    # Un checkpoint d'un autre job (ou d'un autre découpage) ne sert à rien
+    if ckpt["jobs"] != jobs or ckpt["chunk_size"] != chunk_size:
+        return None
+    # Fichier source modifié depuis l'interruption : mélanger les anciens
+    # chunks traités avec les nouvelles données perdrait ces modifications
+    if ckpt.get("source") != source:
+        print("⚠️  users.json a changé depuis l'interruption : on repart du début.")
+        return None
+    return ckpt
+
+
+def save_checkpoint(path, ckpt):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(ckpt, f)
+    os.replace(tmp_path, path)
+
+
+# --- 5. ORCHESTRATION ---
+def run_maintenance(jobs, path=USERS_FILE, chunk_size=CHUNK_SIZE, workers=None):
+    jobs = list(jobs)
+    unknown = [j for j in jobs if j not in MAINTENANCE_JOBS]
+    if unknown:
+        raise ValueError(f"Job(s) inconnu(s) : {unknown}")
+
+    workers = workers or os.cpu_count() or 1
+    out_path = path + ".maintenance.tmp"
+    ckpt_path = path + ".maintenance.ckpt"
+
+    # A. Reprise éventuelle
+    source = source_fingerprint(path)
+    ckpt = load_checkpoint(ckpt_path, jobs, chunk_size, source)
+    if ckpt and os.path.exists(out_path):
+        print(
+            f"↩️  Reprise au chunk {ckpt['chunks_done']} ({ckpt['users_done']} users)."
+        )
+        out = open(out_path, "r+")
+        # Ce qui a été écrit après le dernier checkpoint est rejoué
+        out.truncate(ckpt["out_offset"])
+        out.seek(ckpt["out_offset"])
+    else:
+        ckpt = {
+            "jobs": jobs,
+            "chunk_size": chunk_size,
+            "chunks_done": 0,
+            "users_done": 0,
+            "out_offset": 0,
+            "source": source,
+        }
+        out = open(out_path, "w")
+        out.write("[")
+        ckpt["out_offset"] = out.tell()
+
+    print(f"\n🛠️  Maintenance {', '.join(jobs)} ({workers} process)...")
+    start = time.time()
+
+    def write_chunk(chunk):
+        out.write(format_users(chunk, first=ckpt["users_done"] == 0))
+        out.flush()
+        os.fsync(out.fileno())
+        ckpt["chunks_done"] += 1
+        ckpt["users_done"] += len(chunk)
+        ckpt["out_offset"] = out.tell()
+        save_checkpoint(ckpt_path, ckpt)
+
+        rate = ckpt["users_done"] / max(time.time() - start, 1e-9)
+        print(
+            f"   Chunk {ckpt['chunks_done']} : {ckpt['users_done']} users traités "
+            f"({rate:.0f} users/s)"
+        )
+
+    # Les chunks déjà traités sont relus mais sautés
+    chunks = (
+        chunk
+        for n, chunk in enumerate(iter_user_chunks(path, chunk_size))
+        if n >= ckpt["chunks_done"]
+    )
+
+    try:
+        if workers == 1:
+            init_worker(jobs)
+            for chunk in chunks:
+                write_chunk(process_chunk(jobs, chunk))
+        else:
+            # Au plus 2 chunks en attente par worker : mémoire bornée
+            # (Pool.imap, lui, lirait tout le fichier d'avance)
+            with multiprocessing.Pool(
+                workers, initializer=init_worker, initargs=(jobs,)
+            ) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(process_chunk, (jobs, chunk)))
+                    if len(pending) >= 2 * workers:
+                        write_chunk(pending.popleft().get())
+                while pending:
+                    write_chunk(pending.popleft().get())
+
+        out.write("\n]" if ckpt["users_done"] else "]")
+    finally:
+        out.close()
+
+    # B. Tout est passé : on remplace le fichier d'origine... sauf s'il a été
+    # réécrit pendant le job (on écraserait ces modifications sans le dire)
+    if source_fingerprint(path) != source:
+        os.remove(out_path)
+        if os.path.exists(ckpt_path):
+            os.remove(ckpt_path)
+        raise RuntimeError(
+            f"{path} a été modifié pendant la maintenance : job annulé, à relancer."
+        )
+    os.replace(out_path, path)
+    if os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+    print(f"✅ Maintenance terminée : {ckpt['users_done']} users mis à jour.")
+    return ckpt["users_done"]
+
+
+if __name__ == "__main__":
+    # ex: python maintenance.py decay normalize
+    run_maintenance(sys.argv[1:] or ["decay"])
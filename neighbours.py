@@ -0,0 +1,212 @@
+import json
+import os
+
+import numpy as np
+
+from common import NEIGHBOURS_FILE, load_data, load_neighbour_table, weights_signature
+
+# --- TABLE DES VOISINS PRÉ-CALCULÉS ---
+# Job "batch" : on calcule les distances entre TOUS les users d'un coup
+# (calcul matriciel NumPy), on garde les K plus proches de chacun, et la
+# requête de recommandation lit simplement la table.
+
+TOP_K = 20
+# Les distances sont calculées par tuiles de BLOCK_SIZE lignes x BLOCK_SIZE
+# colonnes, jamais U x U ni même BLOCK_SIZE x U : chaque ligne garde son top-K
+# courant, fusionné avec chaque tuile. Mémoire bornée quel que soit U.
+BLOCK_SIZE = 1024
+
+
+# --- 1. MATRICE DES POIDS ---
+def weight_matrix(users):
+    # Même convention que euclidian_distance : un tag absent vaut 0
+    all_tags = sorted({tag for u in users for tag in u["weights"]})
+    matrix = np.zeros((len(users), len(all_tags)), dtype=np.float64)
+    for i, user in enumerate(users):
+        for j, tag in enumerate(all_tags):
+            matrix[i, j] = user["weights"].get(tag, 0)
+    return matrix
+
+
+def block_distances(matrix, sq_norms, rows, cols):
+    # ||a - b||² = ||a||² + ||b||² - 2 a.b  (un seul produit matriciel par bloc)
+    d2 = (
+        sq_norms[rows][:, None]
+        + sq_norms[cols][None, :]
+        - 2.0 * matrix[rows] @ matrix[cols].T
+    )
+    # Les erreurs d'arrondi peuvent donner -1e-15 : on coupe à 0
+    np.maximum(d2, 0.0, out=d2)
+    return np.sqrt(d2)
+
+
+def merge_top_k(best_d, best_j, dists, cols, k):
+    # Top-K courant (B x k) + une tuile de distances (B x C) -> nouveau top-K.
+    # argpartition : les K plus petits sans trier toute la ligne
+    cand_d = np.concatenate([best_d, dists], axis=1)
+    cand_j = np.concatenate([best_j, np.broadcast_to(cols, dists.shape)], axis=1)
+    part = np.argpartition(cand_d, k - 1, axis=1)[:, :k]
+    return (
+        np.take_along_axis(cand_d, part, axis=1),
+        np.take_along_axis(cand_j, part, axis=1),
+    )
+
+
+def top_k_tiles(matrix, sq_norms, block, best_d, best_j, cols, k, block_size):
+    # Fusionne les colonnes 'cols' dans le top-K des lignes 'block', tuile par tuile
+    for start in range(0, len(cols), block_size):
+        tile = cols[start : start + block_size]
+        dists = block_distances(matrix, sq_norms, block, tile)
+        # On ne se compare pas à soi-même
+        dists[block[:, None] == tile[None, :]] = np.inf
+        best_d, best_j = merge_top_k(best_d, best_j, dists, tile, k)
+    return best_d, best_j
+
+
+def sorted_top_k(best_d, best_j, i):
+    # Ligne i du top-K, triée par distance (puis par index à égalité)
+    order = np.lexsort((best_j[i], best_d[i]))
+    return [
+        (int(best_j[i, o]), float(best_d[i, o]))
+        for o in order
+        if np.isfinite(best_d[i, o])
+    ]
+
+
+def top_k_rows(matrix, rows, k=TOP_K, block_size=BLOCK_SIZE):
+    """
+    Renvoie {index_ligne: [(index_voisin, distance), ...]} trié par distance,
+    en traitant les lignes par blocs et les colonnes par tuiles.
+    """
+    sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+    all_cols = np.arange(matrix.shape[0])
+    kk = min(k, matrix.shape[0] - 1)
+    if kk <= 0:
+        return {int(row): [] for row in rows}
+
+    result = {}
+    for start in range(0, len(rows), block_size):
+        block = np.asarray(rows[start : start + block_size], dtype=np.int64)
+        best_d = np.full((len(block), kk), np.inf)
+        best_j = np.full((len(block), kk), -1, dtype=np.int64)
+        best_d, best_j = top_k_tiles(
+            matrix, sq_norms, block, best_d, best_j, all_cols, kk, block_size
+        )
+        for i, row in enumerate(block):
+            result[int(row)] = sorted_top_k(best_d, best_j, i)
+
+    return result
+
+
+# --- 2. CONSTRUCTION / RAFRAÎCHISSEMENT ---
+def user_positions(users):
+    # Position de chaque user dans users.json : la requête retrouve un voisin
+    # sans parcourir la liste (cf. main.neighbour_user)
+    return {u["user_id"]: i for i, u in enumerate(users)}
+
+
+def build_neighbour_table(users, k=TOP_K, block_size=BLOCK_SIZE):
+    matrix = weight_matrix(users)
+    rows = top_k_rows(matrix, list(range(len(users))), k, block_size)
+
+    table = {"k": k, "users": {}, "pos": user_positions(users)}
+    for i, user in enumerate(users):
+        table["users"][user["user_id"]] = {
+            "sig": weights_signature(user["weights"]),
+            "neighbours": [[users[j]["user_id"], round(d, 6)] for j, d in rows[i]],
+        }
+    return table
+
+
+def refresh_neighbour_table(table, users, k=TOP_K, block_size=BLOCK_SIZE):
+    """
+    Ne recalcule que ce qui a bougé depuis le dernier passage :
+      - les lignes des users dont les poids ont changé (ou nouveaux),
+      - les lignes qui contenaient un user modifié/supprimé parmi leurs K
+        voisins (sa place pourrait revenir à quelqu'un hors de la table),
+    et, pour toutes les autres, on insère juste les distances vers les users
+    modifiés (ils ont pu se rapprocher).
+    """
+    if table is None or table.get("k") != k:
+        return build_neighbour_table(users, k, block_size), len(users)
+
+    index = {u["user_id"]: i for i, u in enumerate(users)}
+    old_rows = table["users"]
+
+    changed = {
+        u["user_id"]
+        for u in users
+        if u["user_id"] not in old_rows
+        or old_rows[u["user_id"]]["sig"] != weights_signature(u["weights"])
+    }
+    removed = set(old_rows) - set(index)
+    if not changed and not removed:
+        table["pos"] = user_positions(users)
+        return table, 0
+
+    moved = changed | removed
+    full_rows = [
+        index[uid]
+        for uid in index
+        if uid in changed
+        or any(other_id in moved for other_id, _ in old_rows[uid]["neighbours"])
+    ]
+    full_set = set(full_rows)
+    patch_rows = [i for i in range(len(users)) if i not in full_set]
+
+    matrix = weight_matrix(users)
+    new_users = {}
+
+    # A. Lignes recalculées entièrement
+    for i, neigh in top_k_rows(matrix, full_rows, k, block_size).items():
+        new_users[users[i]["user_id"]] = {
+            "sig": weights_signature(users[i]["weights"]),
+            "neighbours": [[users[j]["user_id"], round(d, 6)] for j, d in neigh],
+        }
+
+    # B. Lignes "patchées" : top-K de départ = anciens voisins, dans lequel on
+    # fusionne les distances vers les users modifiés (par tuiles, comme en A)
+    changed_cols = np.array(sorted(index[uid] for uid in changed), dtype=np.int64)
+    sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+    for start in range(0, len(patch_rows), block_size):
+        block = np.asarray(patch_rows[start : start + block_size], dtype=np.int64)
+        best_d = np.full((len(block), k), np.inf)
+        best_j = np.full((len(block), k), -1, dtype=np.int64)
+        for i, row in enumerate(block):
+            old = old_rows[users[row]["user_id"]]["neighbours"]
+            best_d[i, : len(old)] = [d for _, d in old]
+            best_j[i, : len(old)] = [index[other_id] for other_id, _ in old]
+        best_d, best_j = top_k_tiles(
+            matrix, sq_norms, block, best_d, best_j, changed_cols, k, block_size
+        )
+        for i, row in enumerate(block):
+            uid = users[row]["user_id"]
+            new_users[uid] = {
+                "sig": old_rows[uid]["sig"],
+                "neighbours": [
+                    [users[j]["user_id"], round(d, 6)]
+                    for j, d in sorted_top_k(best_d, best_j, i)
+                ],
+            }
+
+    table = {"k": k, "users": new_users, "pos": user_positions(users)}
+    return table, len(full_rows)
+
+
+# --- 3. LECTURE / ÉCRITURE ---
+# (la lecture, avec son cache, est dans common.load_neighbour_table)
+def save_neighbour_table(table, path=NEIGHBOURS_FILE):
+    # Écriture dans un fichier temporaire puis remplacement (jamais de table à moitié écrite)
+    # Les clés "_..." sont des index en mémoire, pas à sauvegarder
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({k: v for k, v in table.items() if not k.startswith("_")}, f)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    users, _ = load_data()
+
+    table, nb_rows = refresh_neighbour_table(load_neighbour_table(), users)
+    save_neighbour_table(table)
+    print(f"✅ Table des voisins : {nb_rows} lignes recalculées / {len(users)} users.")
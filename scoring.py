@@ -0,0 +1,256 @@
+import json
+
+import numpy as np
+
+from common import DEFAULT_SLOTS, JITTER_MAX, article_key, request_key
+
+# --- PIPELINE DE SCORING CONFIGURABLE ---
+# La logique de calculate_score (affinité, échelle de niveau, plancher,
+# jitter) décrite en données. Chaque config est "compilée" une fois au
+# démarrage en tableaux NumPy : scorer un user = quelques opérations sur
+# tout le catalogue d'un coup, sans if/elif par article.
+# calculate_score reste la version de référence (boucle Python).
+
+# Reproduit exactement main.calculate_score + le découpage 70/15/15
+DEFAULT_RANKING = {
+    "name": "default",
+    "stages": ["affinity", "level", "floor", "jitter"],
+    # [diff_min, diff_max, bonus] avec diff = niveau article - niveau user
+    # (None = pas de borne). Les tranches doivent couvrir tous les entiers.
+    "level_ladder": [
+        [None, -1, -1.0],  # Trop facile (Petite pénalité)
+        [0, 0, 2.0],  # Parfait match de niveau (Bonus)
+        [1, 1, 0.5],  # Un peu dur (Challenge acceptable)
+        [2, None, -3.0],  # Trop dur (Pénalité forte)
+    ],
+    "default_mastery": 1,
+    "floor": {"below": 0, "value": 0.1},
+    "jitter": JITTER_MAX,
+    "round": 2,
+    "slots": dict(DEFAULT_SLOTS),
+}
+
+
+# --- 1. CATALOGUE COMPILÉ (partagé entre toutes les variantes) ---
+def catalog_fingerprint(articles):
+    # Empreinte bon marché : les IDs (article ajouté, retiré ou déplacé) + la
+    # version du fichier posée par common.load_data (article modifié sur
+    # disque). Une liste simple n'a pas de version : seuls les IDs comptent.
+    return (
+        getattr(articles, "version", None),
+        tuple(a["article_id"] for a in articles),
+    )
+
+
+def compile_catalog(articles):
+    tags = sorted({t for a in articles for t in a["tags"]})
+    tag_index = {t: j for j, t in enumerate(tags)}
+
+    # Matrice d'incidence article x tag : affinité = incidence @ poids_user
+    incidence = np.zeros((len(articles), len(tags)), dtype=np.float64)
+    for i, article in enumerate(articles):
+        for tag in article["tags"]:
+            incidence[i, tag_index[tag]] += 1
+
+    return {
+        "articles": articles,
+        "fingerprint": catalog_fingerprint(articles),
+        "ids": [a["article_id"] for a in articles],
+        "row_of": {a["article_id"]: i for i, a in enumerate(articles)},
+        "tags": tags,
+        "tag_index": tag_index,
+        "incidence": incidence,
+        "main_tag": np.array(
+            [tag_index[a["tags"][0]] for a in articles], dtype=np.int64
+        ),
+        "level": np.array([a["level"] for a in articles], dtype=np.int64),
+        # Clé de hash de chaque article pour le jitter (cf. common.article_jitter)
+        "article_key": np.array(
+            [article_key(a["article_id"]) for a in articles], dtype=np.uint64
+        ),
+    }
+
+
+def compile_ladder(ladder):
+    """
+    Transforme l'échelle [min, max, bonus] en table indexée par
+    diff - diff_min. Les diffs hors de [diff_min, diff_max] sont ramenées
+    au bord, ce qui est juste puisque les tranches extrêmes sont ouvertes.
+    """
+    bounded = sorted(ladder, key=lambda s: float("-inf") if s[0] is None else s[0])
+    if bounded[0][0] is not None or bounded[-1][1] is not None:
+        raise ValueError("level_ladder : les tranches extrêmes doivent être ouvertes")
+    for prev, cur in zip(bounded, bounded[1:]):
+        if prev[1] is None or cur[0] is None or cur[0] != prev[1] + 1:
+            raise ValueError(
+                f"level_ladder : trou ou chevauchement entre {prev} et {cur}"
+            )
+
+    # La table va de la plus petite à la plus grande borne finie de l'échelle
+    finite = [b for s in bounded for b in s[:2] if b is not None] or [0]
+    diff_min, diff_max = min(finite), max(finite)
+
+    table = np.empty(diff_max - diff_min + 1, dtype=np.float64)
+    for low, high, bonus in bounded:
+        lo = diff_min if low is None else low
+        hi = diff_max if high is None else high
+        table[lo - diff_min : hi - diff_min + 1] = bonus
+    return table, diff_min, diff_max
+
+
+def mix64_array(x):
+    # Version NumPy de common.mix64 (les uint64 débordent modulo 2**64, comme le & MASK64)
+    with np.errstate(over="ignore"):
+        z = x + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+# --- 2. LES ÉTAPES (chacune agit sur le vecteur de scores du catalogue) ---
+def stage_affinity(ranking, user, rows, scores, seed, epoch):
+    weights = np.zeros(len(ranking.catalog["tags"]), dtype=np.float64)
+    for tag, w in user["weights"].items():
+        j = ranking.catalog["tag_index"].get(tag)
+        if j is not None:
+            weights[j] = w
+    scores += ranking.catalog["incidence"][rows] @ weights
+
+
+def stage_level(ranking, user, rows, scores, seed, epoch):
+    mastery = np.full(len(ranking.catalog["tags"]), ranking.default_mastery)
+    for tag, lvl in user["mastery"].items():
+        j = ranking.catalog["tag_index"].get(tag)
+        if j is not None:
+            mastery[j] = lvl
+    diff = ranking.catalog["level"][rows] - mastery[ranking.catalog["main_tag"][rows]]
+    np.clip(diff, ranking.diff_min, ranking.diff_max, out=diff)
+    scores += ranking.ladder[diff - ranking.diff_min]
+
+
+def stage_floor(ranking, user, rows, scores, seed, epoch):
+    scores[scores < ranking.floor_below] = ranking.floor_value
+
+
+def stage_jitter(ranking, user, rows, scores, seed, epoch):
+    if seed is None:
+        scores += np.random.uniform(0, ranking.jitter, len(rows))
+        return
+    # Même hash (requête, article) que common.article_jitter -> mêmes valeurs
+    key = np.uint64(request_key(user["user_id"], epoch, seed))
+    h = mix64_array(ranking.catalog["article_key"][rows] ^ key)
+    scores += (h >> np.uint64(11)).astype(np.float64) * 2.0**-53 * ranking.jitter
+
+
+SCORING_STAGES = {
+    "affinity": stage_affinity,
+    "level": stage_level,
+    "floor": stage_floor,
+    "jitter": stage_jitter,
+}
+
+
+# --- 3. UNE VARIANTE COMPILÉE ---
+class CompiledRanking:
+    def __init__(self, config, catalog):
+        unknown = [s for s in config["stages"] if s not in SCORING_STAGES]
+        if unknown:
+            raise ValueError(f"Étape(s) de scoring inconnue(s) : {unknown}")
+
+        self.name = config.get("name", "default")
+        self.config = config
+        self.catalog = catalog
+        # Dernière recompilation faite pour un autre catalogue (cf. for_articles)
+        self.recompiled = None
+        self.stages = [SCORING_STAGES[s] for s in config["stages"]]
+        self.default_mastery = config.get("default_mastery", 1)
+        self.floor_below = config["floor"]["below"]
+        self.floor_value = config["floor"]["value"]
+        self.jitter = config.get("jitter", JITTER_MAX)
+        self.decimals = config.get("round", 2)
+        self.slots = config.get("slots", DEFAULT_SLOTS)
+
+        self.ladder, self.diff_min, self.diff_max = compile_ladder(
+            config["level_ladder"]
+        )
+
+    def score_rows(self, user, rows, seed=None, epoch=0):
+        rows = np.asarray(rows, dtype=np.int64)
+        scores = np.zeros(len(rows), dtype=np.float64)
+        for stage in self.stages:
+            stage(self, user, rows, scores, seed, epoch)
+        return np.round(scores, self.decimals)
+
+    def matches(self, articles):
+        return catalog_fingerprint(articles) == self.catalog["fingerprint"]
+
+    def for_articles(self, articles):
+        """
+        La variante compilée sur CE catalogue : elle-même si rien n'a changé
+        depuis la compilation, sinon une recompilation (gardée pour les
+        requêtes suivantes tant que le catalogue ne rebouge pas).
+        """
+        if self.matches(articles):
+            return self
+        recompiled = self.recompiled
+        if recompiled is None or not recompiled.matches(articles):
+            recompiled = CompiledRanking(self.config, compile_catalog(articles))
+            self.recompiled = recompiled
+        return recompiled
+
+    def score_articles(self, user, articles, seed=None, epoch=0):
+        # Articles hors catalogue compilé : compilés à part avec la même
+        # config (mêmes étapes, donc mêmes scores)
+        row_of = self.catalog["row_of"]
+        known = [a for a in articles if a["article_id"] in row_of]
+        missing = [a for a in articles if a["article_id"] not in row_of]
+
+        rows = [row_of[a["article_id"]] for a in known]
+        scores = dict(
+            zip(
+                (a["article_id"] for a in known),
+                self.score_rows(user, rows, seed, epoch),
+            )
+        )
+        if missing:
+            extra = CompiledRanking(self.config, compile_catalog(missing))
+            scores.update(
+                zip(
+                    (a["article_id"] for a in missing),
+                    extra.score_rows(user, range(len(missing)), seed, epoch),
+                )
+            )
+        return [float(scores[a["article_id"]]) for a in articles]
+
+    def rank(self, user, limit, seed=None, epoch=0):
+        """
+        Les 'limit' meilleurs articles non lus : [(article, score), ...].
+        Tri stable comme dans get_recommendations (ordre du catalogue à égalité).
+        """
+        unread = np.ones(len(self.catalog["ids"]), dtype=bool)
+        for art_id in user["history"]:
+            row = self.catalog["row_of"].get(art_id)
+            if row is not None:
+                unread[row] = False
+
+        rows = np.flatnonzero(unread)
+        scores = self.score_rows(user, rows, seed, epoch)
+        best = np.argsort(-scores, kind="stable")[:limit]
+        articles = self.catalog["articles"]
+        return [(articles[rows[i]], float(scores[i])) for i in best]
+
+
+# --- 4. COMPILATION DE PLUSIEURS VARIANTES (A/B tests) ---
+def compile_ranking(config, articles, catalog=None):
+    return CompiledRanking(config, catalog or compile_catalog(articles))
+
+
+def compile_rankings(configs, articles):
+    # Le catalogue est compilé une seule fois et partagé par toutes les variantes
+    catalog = compile_catalog(articles)
+    return {c["name"]: CompiledRanking(c, catalog) for c in configs}
+
+
+def load_ranking_configs(path):
+    with open(path, "r") as f:
+        return json.load(f)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Les modules sont à la racine du dépôt (pas de package) : on les rend importables
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
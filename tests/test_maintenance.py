@@ -0,0 +1,86 @@
+import json
+import os
+import random
+
+import pytest
+
+import maintenance
+from maintenance import run_maintenance
+
+JOBS = ["decay", "normalize"]
+
+
+def write_users(path, n, seed=0):
+    rng = random.Random(seed)
+    users = [
+        {
+            "user_id": f"user_{i}",
+            "name": f"User{i}",
+            "weights": {f"tag_{j}": round(rng.uniform(0.1, 8), 2) for j in range(4)},
+            "mastery": {},
+            "history": [f"article_{j}" for j in range(rng.randint(0, 5))],
+        }
+        for i in range(n)
+    ]
+    with open(path, "w") as f:
+        json.dump(users, f, indent=4)
+
+
+def interrupt_after(monkeypatch, nb_chunks):
+    # Le job "plante" au chunk nb_chunks + 1
+    calls = []
+    process_chunk = maintenance.process_chunk
+
+    def failing(jobs, chunk):
+        calls.append(1)
+        if len(calls) > nb_chunks:
+            raise KeyboardInterrupt
+        return process_chunk(jobs, chunk)
+
+    monkeypatch.setattr(maintenance, "process_chunk", failing)
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def test_resume_matches_uninterrupted_run(tmp_path, monkeypatch):
+    expected = str(tmp_path / "expected.json")
+    path = str(tmp_path / "users.json")
+    write_users(expected, 23)
+    write_users(path, 23)
+    run_maintenance(JOBS, expected, chunk_size=4, workers=1)
+
+    with monkeypatch.context() as m:
+        interrupt_after(m, 3)
+        with pytest.raises(KeyboardInterrupt):
+            run_maintenance(JOBS, path, chunk_size=4, workers=1)
+    ckpt = json.loads(read(path + ".maintenance.ckpt"))
+    assert ckpt["chunks_done"] == 3
+
+    assert run_maintenance(JOBS, path, chunk_size=4, workers=1) == 23
+    assert read(path) == read(expected)
+    # Même mise en forme que json.dump(indent=4)
+    assert read(path) == json.dumps(json.loads(read(path)), indent=4)
+    assert not os.path.exists(path + ".maintenance.ckpt")
+    assert not os.path.exists(path + ".maintenance.tmp")
+
+
+def test_stale_checkpoint_restarts(tmp_path, monkeypatch):
+    expected = str(tmp_path / "expected.json")
+    path = str(tmp_path / "users.json")
+    write_users(path, 23)
+
+    with monkeypatch.context() as m:
+        interrupt_after(m, 2)
+        with pytest.raises(KeyboardInterrupt):
+            run_maintenance(JOBS, path, chunk_size=4, workers=1)
+
+    # users.json réécrit entre-temps : les chunks déjà traités ne valent plus rien
+    write_users(path, 25, seed=1)
+    write_users(expected, 25, seed=1)
+    run_maintenance(JOBS, expected, chunk_size=4, workers=1)
+
+    run_maintenance(JOBS, path, chunk_size=4, workers=1)
+    assert read(path) == read(expected)
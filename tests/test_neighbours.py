@@ -0,0 +1,67 @@
+import copy
+import random
+
+from main import euclidian_distance
+from neighbours import build_neighbour_table, refresh_neighbour_table
+
+# block_size minuscule : plusieurs blocs de lignes ET plusieurs tuiles de colonnes
+K = 5
+BLOCK = 4
+TAGS = [f"tag_{i}" for i in range(6)]
+
+
+def random_users(n, rng, prefix="user"):
+    return [
+        {
+            "user_id": f"{prefix}_{i}",
+            "weights": {t: rng.uniform(0, 3) for t in rng.sample(TAGS, 4)},
+        }
+        for i in range(n)
+    ]
+
+
+def distances(table, user_id):
+    return [d for _, d in table["users"][user_id]["neighbours"]]
+
+
+def test_build_matches_brute_force():
+    rng = random.Random(0)
+    users = random_users(30, rng)
+    table = build_neighbour_table(users, k=K, block_size=BLOCK)
+
+    for user in users:
+        expected = sorted(
+            round(euclidian_distance(user, other), 6)
+            for other in users
+            if other is not user
+        )[:K]
+        assert distances(table, user["user_id"]) == expected
+
+
+def test_refresh_matches_full_rebuild():
+    rng = random.Random(1)
+    for trial in range(20):
+        users = random_users(rng.randint(2, 40), rng)
+        table = build_neighbour_table(users, k=K, block_size=BLOCK)
+
+        # Poids modifiés, users supprimés et ajoutés
+        updated = copy.deepcopy(users)
+        for user in rng.sample(updated, len(updated) // 3):
+            user["weights"][rng.choice(TAGS)] = rng.uniform(0, 3)
+        for _ in range(rng.randint(0, 2)):
+            updated.pop(rng.randrange(len(updated)))
+        updated += random_users(rng.randint(0, 3), rng, prefix=f"new_{trial}")
+
+        refreshed, _ = refresh_neighbour_table(table, updated, k=K, block_size=BLOCK)
+        rebuilt = build_neighbour_table(updated, k=K, block_size=BLOCK)
+
+        assert refreshed["pos"] == rebuilt["pos"]
+        assert set(refreshed["users"]) == set(rebuilt["users"])
+        for user_id, row in rebuilt["users"].items():
+            assert refreshed["users"][user_id]["sig"] == row["sig"]
+            got = distances(refreshed, user_id)
+            assert len(got) == len(row["neighbours"])
+            # Les distances gardées d'avant sont arrondies à 1e-6
+            assert all(
+                abs(a - b) <= 1e-6 for a, b in zip(got, distances(rebuilt, user_id))
+            )
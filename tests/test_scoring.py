@@ -0,0 +1,78 @@
+import copy
+import json
+import os
+import random
+
+from conftest import ROOT
+from main import calculate_score, get_recommendations
+from scoring import DEFAULT_RANKING, compile_ranking
+
+# DEFAULT_RANKING (compilé en NumPy) doit redonner exactement les scores de
+# calculate_score (boucle Python de référence), jitter seedé compris.
+
+
+def load_fixtures():
+    with open(os.path.join(ROOT, "users.json"), "r") as f:
+        users = json.load(f)
+    with open(os.path.join(ROOT, "articles.json"), "r") as f:
+        articles = json.load(f)
+    return users, articles
+
+
+def random_users(articles, n, rng):
+    # Poids et niveaux variés pour passer par toutes les tranches de l'échelle
+    tags = sorted({t for a in articles for t in a["tags"]})
+    return [
+        {
+            "user_id": f"user_test_{i}",
+            "name": f"Test{i}",
+            "weights": {t: round(rng.uniform(0, 4), 2) for t in rng.sample(tags, 5)},
+            "mastery": {t: rng.randint(1, 3) for t in rng.sample(tags, 5)},
+            "history": [],
+        }
+        for i in range(n)
+    ]
+
+
+def test_compiled_scores_match_reference():
+    users, articles = load_fixtures()
+    users += random_users(articles, 20, random.Random(0))
+    ranking = compile_ranking(DEFAULT_RANKING, articles)
+
+    for user in users:
+        for seed, epoch in [(0, 0), (1, 0), (1, 3), ("abc", 1)]:
+            compiled = ranking.score_rows(user, range(len(articles)), seed, epoch)
+            reference = [calculate_score(user, a, seed, epoch) for a in articles]
+            assert [float(s) for s in compiled] == reference
+
+
+def test_seeded_recommendations_match_reference():
+    users, articles = load_fixtures()
+    ranking = compile_ranking(DEFAULT_RANKING, articles)
+
+    for user in users:
+        _, reference = get_recommendations(
+            user["user_id"], users, articles, seed=7, verbose=False
+        )
+        _, compiled = get_recommendations(
+            user["user_id"], users, articles, seed=7, ranking=ranking, verbose=False
+        )
+        assert compiled == reference
+
+
+def test_appended_article_is_recompiled():
+    users, articles = load_fixtures()
+    ranking = compile_ranking(DEFAULT_RANKING, articles)
+
+    new_article = dict(copy.deepcopy(articles[0]), article_id="article_new")
+    articles.append(new_article)
+    recompiled = ranking.for_articles(articles)
+
+    assert recompiled is not ranking
+    assert recompiled.score_articles(users[0], [new_article], seed=3) == [
+        calculate_score(users[0], new_article, seed=3)
+    ]
+    # Article inconnu du catalogue compilé : même score que la référence
+    assert ranking.score_articles(users[0], [new_article], seed=3) == [
+        calculate_score(users[0], new_article, seed=3)
+    ]